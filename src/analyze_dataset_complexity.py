@@ -4,36 +4,43 @@ import unidic_lite
 import statistics
 from collections import defaultdict
 import os
+from keigo_register import RegisterTally
+from profiling import profiled, stage
+
+def create_tagger():
+    return MeCab.Tagger(f"-d {unidic_lite.DICDIR}")
+
+@profiled("mecab_parse")
+def get_analysis(tagger, text):
+    node = tagger.parseToNode(text)
+    tokens = [] # lemmas
+    pos_list = []
+    while node:
+        if node.surface: # skip BOS/EOS
+            features = node.feature.split(",")
+            pos = features[0]
+            # idx 7 is lemma in unidic
+            lemma = features[7] if len(features) > 7 and features[7] != "*" else node.surface
+            
+            tokens.append(lemma)
+            pos_list.append(pos)
+        node = node.next
+    return tokens, pos_list
 
 def analyze():
-    tagger = MeCab.Tagger(f"-d {unidic_lite.DICDIR}")
+    tagger = create_tagger()
 
-    with open(os.path.join(os.path.dirname(__file__), "..", "data", "jcommonsense", "rewritten_dataset.json"), "r", encoding="utf-8") as f:
+    with open(os.path.join(os.path.dirname(__file__), "..", "data", "jcommonsense", "rewritten_dataset.json"), "r", encoding="utf-8") as f, stage("json_load"):
         data = json.load(f)
         
     stats = defaultdict(lambda: {"pos_counts": defaultdict(int), "token_counts": [], "jaccard_scores": []})
-    
-    def get_analysis(text):
-        node = tagger.parseToNode(text)
-        tokens = [] # lemmas
-        pos_list = []
-        while node:
-            if node.surface: # skip BOS/EOS
-                features = node.feature.split(",")
-                pos = features[0]
-                # idx 7 is lemma in unidic
-                lemma = features[7] if len(features) > 7 and features[7] != "*" else node.surface
-                
-                tokens.append(lemma)
-                pos_list.append(pos)
-            node = node.next
-        return tokens, pos_list
+    registers = RegisterTally()
 
     for item in data:
         orig_text = item.get('original_question', "")
         if not orig_text: continue
         
-        orig_tokens, orig_pos = get_analysis(orig_text)
+        orig_tokens, orig_pos = get_analysis(tagger, orig_text)
         orig_set = set(orig_tokens)
         
         if not orig_tokens: continue
@@ -42,12 +49,13 @@ def analyze():
         for pos in orig_pos:
             stats["original_question"]["pos_counts"][pos] += 1
         stats["original_question"]["jaccard_scores"].append(1.0)
+        registers.add("original_question", item.get('q_id'), orig_tokens, orig_pos)
 
         variations = item.get('variations', {})
         for v_type, v_text in variations.items():
             if not v_text: continue
             
-            v_tokens, v_pos = get_analysis(v_text)
+            v_tokens, v_pos = get_analysis(tagger, v_text)
             v_set = set(v_tokens)
             
             # Jaccard Similarity
@@ -63,6 +71,8 @@ def analyze():
             
             for pos in v_pos:
                 stats[v_type]["pos_counts"][pos] += 1
+            
+            registers.add(v_type, item.get('q_id'), v_tokens, v_pos)
 
     categories = ["original_question", "casual", "standard", "sonkeigo", "kenjougo"]
     
@@ -114,6 +124,15 @@ def analyze():
         
         print(f"{cat:<20} | {avg_len:<8.2f} | {avg_jaccard_str} | {ratio:<9.2f} | {top_pos_str}")
 
+    # keigo register markers per style
+    print()
+    registers.print_report(categories)
+
+    mislabeled_file = os.path.join(os.path.dirname(__file__), "..", "data", "jcommonsense", "mislabeled_registers.json")
+    with open(mislabeled_file, "w", encoding="utf-8") as f, stage("json_dump"):
+        json.dump(registers.mislabeled, f, ensure_ascii=False, indent=2)
+    print(f"\n{len(registers.mislabeled)} mislabeled variations saved to {mislabeled_file}")
+
 if __name__ == "__main__":
     print()
     analyze()
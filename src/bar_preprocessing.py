@@ -0,0 +1,173 @@
+import hashlib
+import os
+from collections import Counter
+from typing import Dict, Optional
+
+from datasets import Dataset, load_dataset
+from dotenv import load_dotenv
+
+from profiling import profiled
+
+load_dotenv(override=True)
+
+HF_TOKEN = os.getenv("HF_TOKEN")
+
+DATASET_NAME = "nguyenthanhasia/japanese-bar-exam-qa"
+NUM_PROC = os.cpu_count()
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cache")
+
+PROMPT_TEMPLATE = "Rewrite this question:\n{question}"
+
+# raw instruction -> rewritten lead sentence of the formatted question
+_INSTRUCTION_TABLE = {
+    '判例の趣旨に照らし記述が正しいか': "次の記述は正しいか否か。",
+    'bの見解がaの見解の批判となっているか': "bの見解はaの見解の批判となっているか否か。",
+    'bの見解がaの見解の根拠となっているか': "bの見解はaの見解の根拠となっているか否か。",
+    '【事例】に対して判例の立場に従って検討し記述が正しいか': "【事例】に対して判例の立場に従って検討すると、次の記述は正しいか否か。",
+    '【事例】に対して判例の立場に従って検討し記述が正しいか': "【事例】に対して判例の立場に従って検討すると、次の記述は正しいか否か。",
+    '【事例】に対して甲の罪責を判例の立場に従って検討した場合,甲に( )内の犯罪が成立するか': "【事例】に対して甲の罪責を判例の立場に従って検討した場合,甲に( )内の犯罪が成立するか否か。",
+    '【事例】及び【判旨】に対して検討し記述が正しいか': "【事例】及び【判旨】に対して検討すると、次の記述は正しいか否か。",
+    '【事例】及び【判旨】に対して記述が正しいか': "【事例】及び【判旨】に対して、次の記述は正しいか否か。",
+    '【判旨】に対して記述が正しいか': "【判旨】に対して、次の記述は正しいか否か。",
+    '【見解】に対して検討し記述が正しいか': "【見解】に対して検討すると、次の記述は正しいか否か。",
+    '【見解】に対して記述が正しいか': "【見解】に対して、次の記述は正しいか否か。", 
+    '使用貸借にのみ当てはまるか。': "次の記述は使用貸借にのみ当てはまるか。",
+    '判例の立場に従って検討し,( )内の甲の行為とVの死亡との間に因果関係が認められるか': "判例の立場に従って検討すると、次の記述において、( )内の甲の行為とVの死亡との間に因果関係が認められるか否か。",
+    '判例の立場に従って検討し,甲に( )内の罪が成立するか': "判例の立場に従って検討すると、次の記述において、甲に( )内の罪が成立するか否か。",
+    '判例の立場に従って検討し,甲に( )内の罪名の間接正犯が成立するか': "判例の立場に従って検討すると、次の記述において、甲に( )内の罪名の間接正犯が成立するか否か。",
+    '判例の立場に従って検討し,甲に横領罪が成立するか': "判例の立場に従って検討すると、次の記述において、甲に横領罪が成立するか否か。",
+    '判例の立場に従って検討した場合,Xに( )内の罪が成立するものか': "判例の立場に従って検討した場合、次の記述において、Xに( )内の罪が成立するものか否か。",
+    '判例の立場に従って検討した場合記述が正しいか': "判例の立場に従って検討した場合、次の記述は正しいか否か。",
+    '判例の立場に従って検討し記述が正しいか': "判例の立場に従って検討すると、次の記述は正しいか否か。",
+    '判例の趣旨に照らして正しいか': "判例の趣旨に照らして、次の記述は正しいか否か。",
+    '判例の趣旨に照らして記述が正しいか': "判例の趣旨に照らして、次の記述は正しいか否か。",
+    '判例の趣旨に照らし記述が正しいか': "判例の趣旨に照らして、次の記述は正しいか否か。",
+    '国政に関する最高の決定権という意味で主権の概念を用いたものか': "次の記述は国政に関する最高の決定権という意味で主権の概念を用いたものか否か。",
+    '契約が成立しているものか': "次の記述は契約が成立しているものか否か。",
+    '放火及び失火の罪に関する記述を検討した場合記述が正しいか': "次の放火及び失火の罪に関する記述は正しいか否か。",
+    '最高 裁判所の判決(最高裁判所昭和62年4月24日第二小法廷判決、民集41巻3号490頁)の趣旨に照らして正しいか': "最高裁判所の判決(最高裁判所昭和62年4月24日第二小法廷判決、民集41巻3号490頁)の趣旨に照らして、次の記述は正しいか否か。",
+    '最高裁判所の判例の趣旨に照らして正しいか': "最高裁判所の判例の趣旨に照らして、次の記述は正しいか否か。",
+    '最高裁判所の判例の趣旨に照らして記述が正しいか': "最高裁判所の判例の趣旨に照らして、次の記述は正しいか否か。",
+    '最高裁判所の判決(最高裁判所平成9年9月9日第三小法廷判決,民集51巻8号3850頁)の趣旨に照らして正しいか': "最高裁判所の判決(最高裁判所平成9年9月9日第三小法廷判決,民集51巻8号3850頁)の趣旨に照らして、次の記述は正しいか否か。",
+    '次の【事例】における甲の罪責について,判例の立場に従って検討した場合記述が正しいか': "【事例】における甲の罪責について、判例の立場に従って検討した場合、次の記述は正しいか否か。",
+    '次の【事例】に対して判例の立場に従って検討した場合記述が正しいか': "【事例】に対して判例の立場に従って検討した場合、次の記述は正しいか否か。",
+    '次の【事例】に対して判例の立場に従って検討し記述が正しいか': "【事例】に対して判例の立場に従って検討すると、次の記述は正しいか否か。",
+    '次の【事例】及び各【見解】に対して検討した場合記述が正しいか': "【事例】及び各【見解】に対して検討した場合、次の記述は正しいか否か。",
+    '次の【見解】に従って後記の【事例】及び記述を検討した場合,【事例】よりも逮捕監禁行為と死亡との間の因果関係を肯定する判断に結び付きやすいか。': "【見解】に従って後記の【事例】及び記述を検討した場合、【事例】よりも逮捕監禁行為と死亡との間の因果関係を肯定する判断に結び付きやすいか否か。",
+    '次の【見解】に従って検討した場合記述が正しいか': "【見解】に従って検討した場合、次の記述は正しいか否か。",
+    '次の各【見解】AないしDに従って後記各【事例】IないしIIIにおける甲の罪責を検討し記述が正しいか': "各【見解】AないしDに従って各【事例】IないしIIIにおける甲の罪責を検討すると、次の記述は正しいか否か。",
+    '次の各【見解】と後記の各【事例】を前提として,検討し記述が正しいか': "各【見解】と各【事例】を前提として検討すると、次の記述は正しいか否か。",
+    '次の各【見解】に対して検討し記述が正しいか': "各【見解】に対して検討すると、次の記述は正しいか否か。",
+    '次の各【見解】に対して記述が正しいか': "各【見解】に対して、次の記述は正しいか否か。",
+    '次の各【見解】に従って後記の各【事例】における甲の罪責を検討した場合記述が正しいか': "各【見解】に従って各【事例】における甲の罪責を検討した場合、次の記述は正しいか否か。",
+    '次の各【見解】に従って検討した場合記述が正しいか': "各【見解】に従って検討した場合、次の記述は正しいか否か。",
+    '正しいか': "次の記述は正しいか否か。",
+    '正しい（明らかに誤りだとは言えない）か': "次の記述は正しい（明らかに誤りだとは言えない）か否か。",
+    '甲に窃盗罪の従犯の成立を肯定する論拠となり得るか。': "次の記述は、甲に窃盗罪の従犯の成立を肯定する論拠となり得るか否か。",
+    '甲のVに対する罪責について,判例の立場に従って検討した場合,甲に殺人罪が成立するか': "甲のVに対する罪責について、判例の立場に従って検討した場合、甲に殺人罪が成立するか否か。",
+    '甲の罪責について判例の立場に従って検討した場合、甲に窃盗罪が成立するか': "甲の罪責について、判例の立場に従って検討した場合、甲に窃盗罪が成立するか否か。",
+    '甲の罪責について判例の立場に従って検討した場合記述が正しいか': "甲の罪責について、判例の立場に従って検討した場合、次の記述は正しいか否か。",
+    '窃盗罪における不法領得の意思についての次の各【見解】に従って後記の各【事例】における甲の罪責を検討した場合記述が正しいか': "窃盗罪における不法領得の意思についての各【見解】に従って各【事例】における甲の罪責を検討した場合、次の記述は正しいか否か。",
+    '結果的加重犯の共同正犯の成立が認められることを前提に,次の【事例】及び各【見解】に対して検討し記述が正しいか': "結果的加重犯の共同正犯の成立が認められることを前提に、【事例】及び各【見解】に対して検討すると、次の記述は正しいか否か。",
+    'かかる見解からの記述として正しいか': "次の記述は、かかる見解からの記述として正しいか否か。",
+    'かかる見解と同じ立場からの記述か': "次の記述は、かかる見解と同じ立場からの記述か否か。",
+    'かかる見解の根拠となる記述か': "次の記述は、かかる見解の根拠となる記述か否か。",
+    "": "" 
+}
+
+# built once at import; keys are stripped so lookups match `instruction.strip()`
+INSTRUCTION_NORMALIZATION: Dict[str, str] = {k.strip(): v for k, v in _INSTRUCTION_TABLE.items()}
+
+def _formatting_hash() -> str:
+    # The table, the prompt template and the formatting functions all live in this file, so hashing its
+    # source invalidates cached rows whenever any of them changes.
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+FORMATTING_HASH = _formatting_hash()
+
+@profiled()
+def format_question(one_row: dict) -> str:
+    """Converts a single row of the Bar Exam dataset into a fully formatted question string."""
+    instruction = one_row.get('instruction', "")
+    subject = one_row.get('subject_jp', "")
+    theme = one_row.get('theme', "")
+    remark = one_row.get('remark', "")
+    lead_in = one_row.get('lead_in', "")
+    question = one_row.get('question', "")
+    
+    manually_fixed_instruction = INSTRUCTION_NORMALIZATION.get(instruction.strip(), instruction)
+    
+    formatted = f"科目：{subject}\n"
+    if theme and theme != "None":
+        formatted += f"{theme}について\n"
+    if lead_in:
+        formatted += f"{lead_in}\n"
+    if instruction:
+        formatted += f"{manually_fixed_instruction}\n"
+    formatted += f"{question}\n"
+    if remark:
+        formatted += f"なお、{remark}\n"
+        
+    return formatted.strip()
+
+def format_row(row: dict) -> dict:
+    instruction = (row.get('instruction') or "").strip()
+    formatted = format_question(row)
+    return {
+        "formatted_question": formatted,
+        "prompt": PROMPT_TEMPLATE.format(question=formatted),
+        "instruction_normalized": instruction in INSTRUCTION_NORMALIZATION,
+    }
+
+@profiled()
+def preprocess_dataset(dataset: Dataset, num_proc: Optional[int] = NUM_PROC, cache_dir: str = CACHE_DIR) -> Dataset:
+    """Adds `formatted_question`, `prompt` and `instruction_normalized` columns to every row.
+
+    Rows are formatted in parallel and the result is cached on disk under the dataset's fingerprint and
+    FORMATTING_HASH, so a rerun over the same rows with the same formatting code only reads the cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"bar_exam_formatted_{dataset._fingerprint}_{FORMATTING_HASH}.arrow")
+    return dataset.map(
+        format_row,
+        num_proc=num_proc if num_proc and num_proc > 1 and len(dataset) > 1 else None,
+        cache_file_name=cache_file,
+        load_from_cache_file=True,
+        desc="Formatting questions",
+    )
+
+def report_unnormalized(formatted: Dataset) -> Counter:
+    """Prints and returns the instructions that have no entry in INSTRUCTION_NORMALIZATION."""
+    missing = Counter(
+        (instruction or "").strip()
+        for instruction, normalized in zip(formatted["instruction"], formatted["instruction_normalized"])
+        if not normalized
+    )
+    if missing:
+        print(f"WARNING: {sum(missing.values())} rows use {len(missing)} instructions with no normalization entry:")
+        for instruction, count in missing.most_common():
+            print(f"  {count:>4} x {instruction}")
+    return missing
+
+def warn_missing_token():
+    if not HF_TOKEN:
+        print("WARNING: HF_TOKEN not found in environment variables.")
+        print("The Bar Exam dataset is gated and requires an HF_TOKEN for access.")
+
+def load_bar_exam(num_samples: Optional[int] = 1000, num_proc: Optional[int] = NUM_PROC) -> Dataset:
+    warn_missing_token()
+    dataset = load_dataset(
+        DATASET_NAME,
+        split="test",
+        trust_remote_code=True,
+        token=HF_TOKEN
+    )
+    subset = dataset.select(range(min(len(dataset), num_samples))) if num_samples is not None else dataset
+    formatted = preprocess_dataset(subset, num_proc=num_proc)
+    report_unnormalized(formatted)
+    return formatted
+
+if __name__ == "__main__":
+    formatted = load_bar_exam()
+    print(f"Formatted {len(formatted)} questions.")
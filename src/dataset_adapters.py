@@ -0,0 +1,129 @@
+import os
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+from datasets import load_dataset
+
+from bar_preprocessing import (
+    DATASET_NAME as BAR_EXAM_DATASET,
+    HF_TOKEN,
+    PROMPT_TEMPLATE,
+    format_row,
+    load_bar_exam,
+    warn_missing_token,
+)
+
+class DatasetAdapter(ABC):
+    """Yields a dataset's rows one at a time as normalized items.
+
+    Every item has `q_id`, `original_question`, `prompt`, `choices` and `label`, which is all the rewriting
+    pipeline needs. Subclasses only implement `_rows`; nothing is materialized beyond what the caller consumes.
+    """
+
+    name = "dataset"
+
+    def items(self, num_samples: Optional[int] = None) -> Iterator[Dict]:
+        rows = self._rows(num_samples)
+        return islice(rows, num_samples) if num_samples is not None else rows
+
+    @abstractmethod
+    def _rows(self, num_samples: Optional[int]) -> Iterator[Dict]:
+        """Yields normalized items; `num_samples` is a hint for sources that can limit what they load."""
+
+    @staticmethod
+    def normalize(q_id, question: str, choices, label, prompt: Optional[str] = None) -> Dict:
+        return {
+            "q_id": q_id,
+            "original_question": question,
+            "prompt": prompt or PROMPT_TEMPLATE.format(question=question),
+            "choices": choices,
+            "label": label,
+        }
+
+def _load_streaming(path: str, **kwargs):
+    """Loads a HF split with streaming=True, falling back to a regular load when the builder cannot stream."""
+    try:
+        return load_dataset(path, streaming=True, **kwargs)
+    except Exception as e:
+        print(f"Streaming unavailable for {path} ({e}); loading the full split.")
+        return load_dataset(path, **kwargs)
+
+class JCommonsenseQAAdapter(DatasetAdapter):
+    name = "jcommonsenseqa"
+
+    def __init__(self, split: str = "validation", streaming: bool = True):
+        # validation is a cleaner evaluation set than train
+        self.split = split
+        self.streaming = streaming
+
+    def _rows(self, num_samples):
+        kwargs = dict(name="JCommonsenseQA", split=self.split, trust_remote_code=True)
+        dataset = _load_streaming("shunk031/JGLUE", **kwargs) if self.streaming else load_dataset("shunk031/JGLUE", **kwargs)
+        for item in dataset:
+            yield self.normalize(
+                item['q_id'],
+                item['question'],
+                [item['choice0'], item['choice1'], item['choice2'], item['choice3'], item['choice4']],
+                item['label'],
+            )
+
+class BarExamAdapter(DatasetAdapter):
+    """Japanese Bar Exam QA.
+
+    By default rows come from the parallel, disk-cached preprocessing stage (see bar_preprocessing), which is
+    memory-mapped and read lazily. With `streaming=True` rows are fetched and formatted one by one instead.
+    """
+
+    name = "bar_exam"
+
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming
+
+    def _rows(self, num_samples):
+        if self.streaming:
+            warn_missing_token()
+            dataset = _load_streaming(BAR_EXAM_DATASET, split="test", trust_remote_code=True, token=HF_TOKEN)
+            dataset = (dict(row, **format_row(row)) for row in dataset)
+        else:
+            dataset = load_bar_exam(num_samples)
+
+        for i, item in enumerate(dataset):
+            if not item['formatted_question']:
+                print(f"Skipping row {i}: Formatted question is empty.")
+                continue
+            yield self.normalize(
+                item.get('id', i),
+                item['formatted_question'],
+                item.get('choices'),
+                item.get('answer'),
+                prompt=item['prompt'],
+            )
+
+class CsvAdapter(DatasetAdapter):
+    """A CSV with JCommonsenseQA columns (q_id, question, choice0-4, label), e.g. a translated copy of it."""
+
+    name = "csv"
+
+    def __init__(self, path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jcommonsenseqa_zh.csv"),
+                 chunksize: int = 1000):
+        self.path = path
+        self.chunksize = chunksize
+
+    def _rows(self, num_samples):
+        row_index = 0
+        for chunk in pd.read_csv(self.path, chunksize=self.chunksize):
+            for item in chunk.to_dict('records'):
+                i, row_index = row_index, row_index + 1
+                # NOTE: Using .get() ensures the script doesn't crash if the column name is wrong
+                original_q = item.get('question')
+                if not isinstance(original_q, str) or not original_q:
+                    print(f"Skipping row {i}: 'question' field not found. Check CSV column names.")
+                    continue
+                yield self.normalize(
+                    item.get('q_id'),
+                    original_q,
+                    [item.get('choice0'), item.get('choice1'), item.get('choice2'), item.get('choice3'), item.get('choice4')],
+                    item.get('label'),
+                )
@@ -6,6 +6,7 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 from tqdm import tqdm
 import pandas as pd
+from profiling import profiled, stage
 
 load_dotenv(override=True)
 
@@ -27,6 +28,7 @@ STYLES = ["original_question", "casual", "standard", "sonkeigo", "kenjougo"]
 
 ANSWER_MAP = {0: "A", 1: "B", 2: "C", 3: "D", 4: "E"} 
 
+@profiled()
 def create_model_prompt(question: str, choices: List[str]) -> str:
     
     choice_text = "\n".join([f"{ANSWER_MAP[i]}. {c}" for i, c in enumerate(choices)])
@@ -77,7 +79,8 @@ def evaluate_style(data: List[Dict[str, Any]], style_key: str) -> Dict[str, Any]
         is_correct = False
         
         try:
-            response = model.generate_content(prompt)
+            with stage("api_call"):
+                response = model.generate_content(prompt)
             model_answer_letter = response.text.strip().upper()
             
             if model_answer_letter == correct_letter:
@@ -118,7 +121,7 @@ def run_evaluation_pipeline(input_file: str = "data/rewritten_dataset.json"):
         return
 
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
+        with open(input_file, 'r', encoding='utf-8') as f, stage("json_load"):
             data = json.load(f)
         print(f"Successfully loaded {len(data)} questions from {input_file}.")
     except Exception as e:
@@ -133,7 +136,7 @@ def run_evaluation_pipeline(input_file: str = "data/rewritten_dataset.json"):
         style_results = evaluate_style(data, style)
         
         output_filename = os.path.join(output_dir, f"{style}.accuracy_2_0.json")
-        with open(output_filename, 'w', encoding='utf-8') as f:
+        with open(output_filename, 'w', encoding='utf-8') as f, stage("json_dump"):
             json.dump(style_results, f, ensure_ascii=False, indent=2)
             
         print(f"✅ Results for {style} saved to {output_filename}. Accuracy: {style_results['accuracy']:.4f}")
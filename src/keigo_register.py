@@ -0,0 +1,201 @@
+from collections import defaultdict, deque
+from itertools import product
+from typing import Dict, Iterable, List, Tuple
+
+from profiling import profiled
+
+REGISTERS = ["sonkeigo", "kenjougo", "teineigo"]
+
+# Each marker is a sequence of lemma-stream symbols. An element can be a tuple of alternatives,
+# and "<POS>" matches any token of that POS whose lemma is not itself a marker symbol.
+# Lemmas follow unidic (お/ご prefix -> 御, なる -> 成る, いただく -> 頂く, ...); kana spellings are
+# listed too in case the dictionary leaves them unnormalized.
+REGISTER_MARKERS = {
+    "sonkeigo": [
+        ("御", ("<動詞>", "<名詞>"), "に", ("成る", "なる")),
+        ("御", ("<動詞>", "<名詞>"), ("為さる", "なさる")),
+        # お答えいただけますか / ご教示ください: requests that exalt the listener's action.
+        # UniDic folds the potential いただける into 頂く; the kana forms are a fallback for other dictionaries
+        ("御", ("<動詞>", "<名詞>"), ("頂く", "いただく", "頂ける", "いただける", "下さる", "くださる")),
+        (("いらっしゃる", "いらっしゃれる"),),
+        (("仰る", "おっしゃる"),),
+        # 仰せになる / 仰せられる
+        ("仰せ", "に", ("成る", "なる")),
+        ("仰す",),
+        (("為さる", "なさる"),),
+        (("召し上がる", "召しあがる"),),
+        (("御覧", "ご覧"),),
+        ("御", "覧"),
+        (("御存じ", "ご存じ", "ご存知"),),
+        ("御", ("存ずる", "存じる")),
+        (("下さる", "くださる"), "ます"),
+        # 配達してくださる: the giver's action is exalted
+        ("て", ("下さる", "くださる")),
+    ],
+    "kenjougo": [
+        ("御", ("<動詞>", "<名詞>"), ("為る", "する")),
+        ("御", ("<動詞>", "<名詞>"), ("致す", "いたす")),
+        ("御", ("<動詞>", "<名詞>"), "申し上げる"),
+        (("伺う", "うかがう"),),
+        (("申し上げる", "申しあげる"),),
+        (("申す", "もうす"),),
+        (("頂く", "いただく", "頂ける", "いただける"),),
+        (("致す", "いたす"),),
+        (("参る", "まいる"),),
+        ("拝見",),
+        (("存じる", "存ずる", "存じ上げる"),),
+        (("差し上げる", "さしあげる"),),
+        (("承る", "うけたまわる"),),
+    ],
+    "teineigo": [
+        ("です",),
+        ("ます",),
+        (("御座る", "ござる"),),
+        (("下さる", "くださる"),),
+    ],
+}
+
+# Markers that are only weak evidence of a register: れる/られる after a verb is honorific (取引される, 来られる)
+# but just as often passive or potential, and お/ご + noun (ご自身, お考え) is also plain bikago (お茶, ご飯).
+# They are counted under "<register>_weak" and only keep a variation from being reported as mislabeled.
+WEAK_REGISTER_MARKERS = {
+    "sonkeigo": [
+        (("<動詞>", "為る", "成る"), ("れる", "られる")),
+        ("御", "<名詞>"),
+    ],
+}
+
+def weak_key(register: str) -> str:
+    return f"{register}_weak"
+
+# register a variation must show to count as correctly labeled
+EXPECTED_REGISTER = {
+    "standard": "teineigo",
+    "sonkeigo": "sonkeigo",
+    "kenjougo": "kenjougo",
+}
+
+class MarkerAutomaton:
+    """Aho-Corasick automaton over a stream of lemma symbols.
+
+    Matches every marker of every register in one left-to-right pass, so the cost per text is linear in its token count.
+    """
+
+    def __init__(self, markers: Dict[str, List[tuple]] = REGISTER_MARKERS,
+                 weak_markers: Dict[str, List[tuple]] = WEAK_REGISTER_MARKERS):
+        labeled = dict(markers)
+        labeled.update({weak_key(register): register_markers for register, register_markers in weak_markers.items()})
+        self.labels = list(labeled)
+        self.vocab = set()
+        patterns: List[Tuple[Tuple[str, ...], str]] = []
+        for register, register_markers in labeled.items():
+            for marker in register_markers:
+                options = [element if isinstance(element, tuple) else (element,) for element in marker]
+                for symbols in product(*options):
+                    patterns.append((symbols, register))
+                    self.vocab.update(s for s in symbols if not s.startswith("<"))
+
+        self.goto: List[Dict[str, int]] = [{}]
+        self.out: List[List[str]] = [[]]
+        for symbols, register in patterns:
+            state = 0
+            for symbol in symbols:
+                if symbol not in self.goto[state]:
+                    self.goto.append({})
+                    self.out.append([])
+                    self.goto[state][symbol] = len(self.goto) - 1
+                state = self.goto[state][symbol]
+            self.out[state].append(register)
+
+        self.fail = [0] * len(self.goto)
+        # depth-1 states keep fail = 0 (root); deeper ones are resolved breadth-first
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and symbol not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(symbol, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def symbols(self, tokens: List[str], pos_list: List[str]) -> Iterable[str]:
+        vocab = self.vocab
+        return (lemma if lemma in vocab else f"<{pos}>" for lemma, pos in zip(tokens, pos_list))
+
+    @profiled("keigo_markers")
+    def count(self, tokens: List[str], pos_list: List[str]) -> Dict[str, int]:
+        """Returns the number of markers found per register (and per `weak_key(register)`) for one analyzed text."""
+        counts = dict.fromkeys(self.labels, 0)
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for symbol in self.symbols(tokens, pos_list):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for register in out[state]:
+                counts[register] += 1
+        return counts
+
+def is_mislabeled(style: str, counts: Dict[str, int]) -> bool:
+    """True when a variation shows no evidence of its register; for casual, when it shows any strong keigo marker."""
+    if style == "casual":
+        return any(counts[register] for register in REGISTERS)
+    expected = EXPECTED_REGISTER.get(style)
+    return expected is not None and counts[expected] == 0 and counts.get(weak_key(expected), 0) == 0
+
+def has_weak_evidence_only(style: str, counts: Dict[str, int]) -> bool:
+    expected = EXPECTED_REGISTER.get(style)
+    return expected is not None and counts[expected] == 0 and counts.get(weak_key(expected), 0) > 0
+
+class RegisterTally:
+    """Accumulates per-style marker rates and mislabeled items while the dataset is analyzed."""
+
+    def __init__(self, automaton: MarkerAutomaton = None):
+        self.automaton = automaton or MarkerAutomaton()
+        self.stats = defaultdict(lambda: {"texts": 0, "tokens": 0, "texts_with": defaultdict(int), "markers": defaultdict(int)})
+        self.mislabeled: List[Dict] = []
+        # variations whose register rests only on weak markers (e.g. a れる/られる that may be passive)
+        self.weak_only: List[Dict] = []
+
+    def add(self, style: str, q_id, tokens: List[str], pos_list: List[str]) -> Dict[str, int]:
+        counts = self.automaton.count(tokens, pos_list)
+        s = self.stats[style]
+        s["texts"] += 1
+        s["tokens"] += len(tokens)
+        for register, n in counts.items():
+            s["markers"][register] += n
+            if n:
+                s["texts_with"][register] += 1
+        if is_mislabeled(style, counts):
+            self.mislabeled.append({"q_id": q_id, "style": style, "markers": counts})
+        elif has_weak_evidence_only(style, counts):
+            self.weak_only.append({"q_id": q_id, "style": style, "markers": counts})
+        return counts
+
+    def print_report(self, categories: List[str]):
+        header = " | ".join(f"{r + ' %':<12} | {r[:5] + '/100t':<10}" for r in REGISTERS)
+        print(f"{'Category':<20} | {header} | {'Mislabeled':<10} | {'Weak only'}")
+        print("-" * 135)
+
+        mislabeled_counts = defaultdict(int)
+        for m in self.mislabeled:
+            mislabeled_counts[m["style"]] += 1
+        weak_counts = defaultdict(int)
+        for m in self.weak_only:
+            weak_counts[m["style"]] += 1
+
+        for cat in categories:
+            s = self.stats[cat]
+            if not s["texts"]:
+                print(f"{cat:<20} | N/A")
+                continue
+            cells = []
+            for register in REGISTERS:
+                text_rate = s["texts_with"][register] / s["texts"]
+                token_rate = 100 * s["markers"][register] / s["tokens"] if s["tokens"] else 0.0
+                cells.append(f"{text_rate:<12.3f} | {token_rate:<10.2f}")
+            mislabeled = f"{mislabeled_counts[cat]}" if cat in EXPECTED_REGISTER or cat == "casual" else "N/A"
+            weak = f"{weak_counts[cat]}" if cat in EXPECTED_REGISTER else "N/A"
+            print(f"{cat:<20} | {' | '.join(cells)} | {mislabeled:<10} | {weak}")
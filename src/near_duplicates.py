@@ -0,0 +1,197 @@
+import json
+import os
+import zlib
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from analyze_dataset_complexity import create_tagger, get_analysis
+from keigo_register import MarkerAutomaton
+from profiling import profiled
+
+VARIATION_KEYS = ["casual", "standard", "sonkeigo", "kenjougo"]
+
+SHINGLE_SIZE = 2
+NUM_PERM = 128
+# 16 bands x 8 rows puts the LSH candidate threshold at ~(1/16)^(1/8) = 0.71 Jaccard
+NUM_BANDS = 16
+SIMILARITY_THRESHOLD = 0.8
+# JCommonsenseQA questions are ~10 lemmas, where shared phrasing like 〜のことを何と言う alone scores ~0.8,
+# so pairs involving a text this short must clear a stricter threshold
+SHORT_TEXT_LEMMAS = 15
+SHORT_TEXT_THRESHOLD = 0.9
+
+_PRIME = np.uint64((1 << 31) - 1)  # keeps a * x + b below 2^62, so uint64 arithmetic never overflows
+_EMPTY = _PRIME
+
+def shingles(lemmas: List[str], k: int = SHINGLE_SIZE) -> set:
+    """Lemma k-grams of a text; texts shorter than k become a single shingle."""
+    if len(lemmas) < k:
+        return {"\x1f".join(lemmas)} if lemmas else set()
+    return {"\x1f".join(lemmas[i:i + k]) for i in range(len(lemmas) - k + 1)}
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    @profiled("minhash")
+    def signature(self, shingle_set: Iterable[str]) -> np.ndarray:
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingle_set), dtype=np.uint64)
+        if x.size == 0:
+            return np.full(self.a.shape, _EMPTY, dtype=np.uint64)
+        # (len(x), num_perm) universal hashes, min over shingles
+        return ((x[:, None] * self.a + self.b) % _PRIME).min(axis=0)
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; only keys sharing a band bucket are ever compared."""
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS):
+        if num_perm % num_bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by num_bands ({num_bands})")
+        self.rows = num_perm // num_bands
+        self.num_bands = num_bands
+        self.buckets: List[Dict[bytes, List]] = [defaultdict(list) for _ in range(num_bands)]
+        self.signatures: Dict = {}
+
+    def insert(self, key, sig: np.ndarray):
+        self.signatures[key] = sig
+        for band in range(self.num_bands):
+            chunk = sig[band * self.rows:(band + 1) * self.rows].tobytes()
+            self.buckets[band][chunk].append(key)
+
+    def candidate_pairs(self) -> set:
+        pairs = set()
+        for band in self.buckets:
+            for keys in band.values():
+                if len(keys) > 1:
+                    pairs.update(combinations(keys, 2))
+        return pairs
+
+    def near_duplicates(self, threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple]:
+        found = []
+        for a, b in self.candidate_pairs():
+            score = similarity(self.signatures[a], self.signatures[b])
+            if score >= threshold:
+                found.append((a, b, score))
+        return sorted(found, key=lambda x: x[2], reverse=True)
+
+def required_similarity(num_lemmas: int, threshold: float = SIMILARITY_THRESHOLD) -> float:
+    return max(threshold, SHORT_TEXT_THRESHOLD) if num_lemmas < SHORT_TEXT_LEMMAS else threshold
+
+def find_near_duplicates(data: List[Dict], threshold: float = SIMILARITY_THRESHOLD) -> Dict[str, List[Dict]]:
+    """Flags near-duplicate texts within each item and near-duplicate items across the dataset.
+
+    Within an item the 5 texts are compared directly (constant work per item); across items the original
+    questions go through the LSH index, so the whole pass stays sub-quadratic.
+
+    Within-item pairs record whether both texts show the same keigo register markers: variations that differ only
+    in their keigo verb (仰いますか / 伺いますか) score high but still did their job. Across-item pairs record
+    whether the two items also share their choices and label, i.e. are the same question rather than similar wording.
+    """
+    tagger = create_tagger()
+    hasher = MinHasher()
+    index = LSHIndex()
+    automaton = MarkerAutomaton()
+
+    within_item = []
+    lengths = {}
+    for position, item in enumerate(tqdm(data, desc="Hashing")):
+        texts = {"original_question": item.get("original_question", "")}
+        texts.update({k: v for k, v in item.get("variations", {}).items() if k in VARIATION_KEYS})
+
+        sigs, sizes, registers = {}, {}, {}
+        for key, text in texts.items():
+            if text:
+                lemmas, pos_list = get_analysis(tagger, text)
+                sigs[key] = hasher.signature(shingles(lemmas))
+                sizes[key] = len(lemmas)
+                registers[key] = automaton.count(lemmas, pos_list)
+
+        for a, b in combinations(sigs, 2):
+            score = similarity(sigs[a], sigs[b])
+            if score >= required_similarity(min(sizes[a], sizes[b]), threshold):
+                within_item.append({
+                    "q_id": item.get("q_id"),
+                    "pair": [a, b],
+                    "similarity": score,
+                    "same_register": registers[a] == registers[b],
+                })
+
+        if "original_question" in sigs:
+            index.insert(position, sigs["original_question"])
+            lengths[position] = sizes["original_question"]
+
+    across_items = []
+    for a, b, score in index.near_duplicates(threshold):
+        a, b = sorted((a, b))
+        if score < required_similarity(min(lengths[a], lengths[b]), threshold):
+            continue
+        across_items.append({
+            "q_ids": [data[a].get("q_id"), data[b].get("q_id")],
+            "positions": [a, b],
+            "similarity": score,
+            "same_answers": data[a].get("choices") == data[b].get("choices") and data[a].get("label") == data[b].get("label"),
+        })
+
+    return {"within_item": within_item, "across_items": across_items}
+
+def filter_dataset(data: List[Dict], duplicates: Dict[str, List[Dict]]) -> List[Dict]:
+    """Drops items whose variations collapse into each other and every later copy of a duplicated question.
+
+    A collapsed pair must also share its register markers. Variations matching only `original_question` are kept:
+    the original is often already casual or standard. Across items only pairs with the same choices and label are
+    dropped; similar wording alone is left in the report for manual review.
+    """
+    drop_q_ids = {
+        d["q_id"] for d in duplicates["within_item"]
+        if "original_question" not in d["pair"] and d["same_register"]
+    }
+    drop_positions = {d["positions"][1] for d in duplicates["across_items"] if d["same_answers"]}
+    return [
+        item for position, item in enumerate(data)
+        if position not in drop_positions and item.get("q_id") not in drop_q_ids
+    ]
+
+def deduplicate(input_file=None, output_file=None, report_file=None):
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "data", "jcommonsense")
+    input_file = input_file or os.path.join(data_dir, "rewritten_dataset.json")
+    output_file = output_file or os.path.join(data_dir, "rewritten_dataset.dedup.json")
+    report_file = report_file or os.path.join(data_dir, "near_duplicates.json")
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    duplicates = find_near_duplicates(data)
+
+    pair_counts = defaultdict(int)
+    for d in duplicates["within_item"]:
+        pair_counts[" / ".join(d["pair"])] += 1
+
+    print(f"\n{'Within-item pair':<40} | {'Count'}")
+    print("-" * 50)
+    for pair, count in sorted(pair_counts.items(), key=lambda x: x[1], reverse=True):
+        print(f"{pair:<40} | {count}")
+    same_answers = sum(d["same_answers"] for d in duplicates["across_items"])
+    print(f"\nNear-duplicate questions across items: {len(duplicates['across_items'])} ({same_answers} with the same choices and label)")
+
+    filtered = filter_dataset(data, duplicates)
+
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(duplicates, f, ensure_ascii=False, indent=2)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(filtered, f, ensure_ascii=False, indent=2)
+
+    print(f"Kept {len(filtered)} of {len(data)} items -> {output_file}")
+    print(f"Report saved to {report_file}")
+
+if __name__ == "__main__":
+    deduplicate()
@@ -0,0 +1,169 @@
+# Opt-in per-stage profiling. JP_POLITENESS_PROFILE=1 times each `stage()` and prints a breakdown at exit;
+# JP_POLITENESS_PROFILE=memory also tracks allocations with tracemalloc, which slows every allocation, so its
+# timings are inflated. JP_POLITENESS_PROFILE_DIR additionally dumps cProfile data per stage.
+# tracemalloc is process-wide, so memory is only reported for stages that never overlapped a stage running
+# in another thread; stages run inside datasets.map(num_proc=...) workers are not recorded.
+import atexit
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+ENV_FLAG = "JP_POLITENESS_PROFILE"
+ENV_DIR = "JP_POLITENESS_PROFILE_DIR"
+
+_state = {"enabled": None, "memory": False, "dump_dir": None, "started": None}
+_lock = threading.Lock()
+_local = threading.local()
+_stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "net_bytes": 0, "peak_bytes": 0, "concurrent": False})
+_profiles = defaultdict(list)
+# thread id -> that thread's open stage frames, to detect stages overlapping across threads
+_active_stacks = {}
+
+def enabled() -> bool:
+    if _state["enabled"] is None:
+        flag = os.getenv(ENV_FLAG, "").lower()
+        enable(flag in ("1", "true", "yes", "time", "memory"), os.getenv(ENV_DIR) or None, memory=flag == "memory")
+    return _state["enabled"]
+
+def enable(on: bool = True, dump_dir: str = None, memory: bool = False):
+    """Turns profiling on or off explicitly instead of through the environment."""
+    _state["enabled"] = on
+    _state["memory"] = on and memory
+    _state["dump_dir"] = dump_dir
+    if on and _state["started"] is None:
+        _state["started"] = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        atexit.register(report)
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+        _local.profiles = {}
+    return _local.stack
+
+def _enter(frame: dict, stack: list):
+    thread_id = threading.get_ident()
+    with _lock:
+        others = [s for tid, s in _active_stacks.items() if tid != thread_id and s]
+        if others:
+            frame["concurrent"] = True
+            for other in others:
+                for f in other:
+                    f["concurrent"] = True
+        _active_stacks[thread_id] = stack
+
+@contextmanager
+def stage(name: str):
+    if not enabled():
+        yield
+        return
+
+    memory = _state["memory"]
+    stack = _stack()
+    frame = {"concurrent": False, "start_bytes": 0, "peak": 0}
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # resetting the peak below would hide the parent's peak so far; fold it into the parent first
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start_bytes"] = frame["peak"] = current
+    stack.append(frame)
+    _enter(frame, stack)
+
+    # cProfile hooks are per-thread and do not nest, so only the outermost stage of a thread is profiled
+    profile = None
+    if _state["dump_dir"] and len(stack) == 1:
+        profile = _local.profiles.get(name)
+        if profile is None:
+            profile = _local.profiles[name] = cProfile.Profile()
+            with _lock:
+                _profiles[name].append(profile)
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; another thread already holds it
+            profile = None
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+        end_bytes = 0
+        if memory:
+            end_bytes, peak = tracemalloc.get_traced_memory()
+            frame["peak"] = max(frame["peak"], peak)
+        stack.pop()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], frame["peak"])
+
+        with _lock:
+            s = _stats[name]
+            s["calls"] += 1
+            s["seconds"] += elapsed
+            s["net_bytes"] += end_bytes - frame["start_bytes"]
+            s["peak_bytes"] = max(s["peak_bytes"], frame["peak"] - frame["start_bytes"])
+            s["concurrent"] = s["concurrent"] or frame["concurrent"]
+
+def profiled(name: str = None):
+    """Decorator form of `stage`; the stage name defaults to the function name."""
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def report():
+    if not _state["enabled"] or not _stats:
+        return
+    wall = time.perf_counter() - _state["started"]
+    memory = _state["memory"]
+
+    print()
+    print(f"Stage profile ({wall:.2f}s wall, stage times inclusive of nested stages)")
+    if memory:
+        print("NOTE: tracemalloc is on, so times include its per-allocation overhead; "
+              "use JP_POLITENESS_PROFILE=1 for clean timings.")
+        print("Memory is n/a for stages that overlapped stages in other threads (tracemalloc is process-wide).")
+    header = f"{'Stage':<24} | {'Calls':<8} | {'Total s':<9} | {'Mean ms':<9} | {'% wall':<7}"
+    print(header + (f" | {'Net KiB':<10} | {'Peak KiB'}" if memory else ""))
+    print("-" * (100 if memory else 70))
+    with _lock:
+        rows = sorted(_stats.items(), key=lambda x: x[1]["seconds"], reverse=True)
+    for name, s in rows:
+        mean_ms = 1000 * s["seconds"] / s["calls"] if s["calls"] else 0.0
+        share = 100 * s["seconds"] / wall if wall > 0 else 0.0
+        line = f"{name:<24} | {s['calls']:<8} | {s['seconds']:<9.3f} | {mean_ms:<9.3f} | {share:<7.1f}"
+        if memory:
+            if s["concurrent"]:
+                line += f" | {'n/a':<10} | n/a"
+            else:
+                line += f" | {s['net_bytes'] / 1024:<10.1f} | {s['peak_bytes'] / 1024:.1f}"
+        print(line)
+
+    dump_dir = _state["dump_dir"]
+    if dump_dir and _profiles:
+        os.makedirs(dump_dir, exist_ok=True)
+        for name, profiles in _profiles.items():
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            path = os.path.join(dump_dir, f"{name}.prof")
+            stats.dump_stats(path)
+        print(f"cProfile output per stage saved to {dump_dir}")
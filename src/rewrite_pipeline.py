@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from tqdm import tqdm
+
+from dataset_adapters import DatasetAdapter
+from profiling import profiled, stage
+from semantic_gate import format_failures, gate_variations
+
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+INITIAL_DELAY = 5
+SAVE_EVERY = 50
+# minimum seconds between the starts of two API requests, across all workers
+MIN_REQUEST_INTERVAL = 0.0
+
+@profiled("parse_response")
+def parse_variations(text: str) -> Dict:
+    json_text = text.strip()
+    if json_text.startswith("```json"):
+         json_text = json_text.lstrip("```json").rstrip("```").strip()
+
+    return json.loads(json_text)
+
+def _is_retryable(error_message: str) -> bool:
+    return "400" in error_message or "403" in error_message or "429" in error_message or "50" in error_message
+
+def _bounded_map(fn: Callable, items: Iterable, max_workers: int) -> Iterator:
+    """Like executor.map, but keeps at most 2 * max_workers items in flight so a lazy source stays lazy."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+class RewritePipeline:
+    """Prompt -> parse -> semantic gate -> save loop shared by every dataset adapter."""
+
+    def __init__(self, model, max_workers: int = MAX_WORKERS, max_retries: int = MAX_RETRIES,
+                 initial_delay: float = INITIAL_DELAY, min_request_interval: float = MIN_REQUEST_INTERVAL):
+        self.model = model
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.min_request_interval = min_request_interval
+        self._throttle_lock = threading.Lock()
+        self._next_request = 0.0
+
+    def _throttle(self):
+        """Spaces request starts at least min_request_interval apart, however many workers are running."""
+        if not self.min_request_interval:
+            return
+        with self._throttle_lock:
+            now = time.monotonic()
+            if self._next_request > now:
+                time.sleep(self._next_request - now)
+                now = self._next_request
+            self._next_request = now + self.min_request_interval
+
+    def generate_variations(self, prompt: str) -> Dict:
+        self._throttle()
+        with stage("api_call"):
+            response = self.model.generate_content(prompt)
+        return parse_variations(response.text)
+
+    def _generate_with_retries(self, q_id, prompt: str) -> Dict:
+        for attempt in range(self.max_retries):
+            try:
+                return self.generate_variations(prompt)
+            except Exception as e:
+                error_message = str(e)
+
+                if not _is_retryable(error_message):
+                    print(f"\nNon-API Error processing q_id {q_id}: {e}")
+                    return {"error": f"LOCAL_ERROR: {error_message}"}
+                if attempt < self.max_retries - 1:
+                    wait_time = self.initial_delay * (2 ** attempt)
+                    print(f"\nAPI Error (q_id {q_id}, Attempt {attempt + 1}): {error_message}")
+                    print(f"  -> Retrying in {wait_time} seconds...")
+                    time.sleep(wait_time)
+                else:
+                    print(f"\nFailed permanently after {self.max_retries} attempts for q_id {q_id}.")
+                    return {"error": f"API_FAILED_PERMANENTLY: {error_message}"}
+        return {"error": "NO_ATTEMPTS"}
+
+    def rewrite(self, item: Dict) -> Tuple[Optional[Dict], str]:
+        """Rewrites one normalized item. Returns (entry, status) where status is "ok", "error" or "rejected".
+
+        Never raises: a failure on one item is reported and skipped so the rest of the run continues.
+        """
+        try:
+            return self._rewrite(item)
+        except Exception as e:
+            print(f"\nError processing q_id {item.get('q_id')}: {e}")
+            return None, "error"
+
+    def _rewrite(self, item: Dict) -> Tuple[Optional[Dict], str]:
+        q_id = item["q_id"]
+        variations = self._generate_with_retries(q_id, item["prompt"])
+        if not isinstance(variations, dict):
+            print(f"\nError processing q_id {q_id}: expected a JSON object, got {type(variations).__name__}")
+            return None, "error"
+        if not variations or variations.get("error"):
+            return None, "error"
+
+        variations, failures = gate_variations(
+            item["original_question"], variations,
+            regenerate=self.generate_variations,
+            prompt=item["prompt"],
+        )
+        if failures:
+            print(f"\nRejected q_id {q_id}: {format_failures(failures)}")
+            return None, "rejected"
+
+        entry = {
+            "q_id": q_id,
+            "original_question": item["original_question"],
+            "variations": variations,
+            "choices": item["choices"],
+            "label": item["label"]
+        }
+        return entry, "ok"
+
+    def run(self, adapter: DatasetAdapter, output_file: str, num_samples: Optional[int] = 1000):
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        print(f"Starting rewriting for up to {num_samples} {adapter.name} samples...")
+
+        results = []
+        counts = {"ok": 0, "error": 0, "rejected": 0}
+        outcomes = _bounded_map(self.rewrite, adapter.items(num_samples), self.max_workers)
+
+        for i, (entry, status) in enumerate(tqdm(outcomes, total=num_samples)):
+            counts[status] += 1
+            if entry is not None:
+                results.append(entry)
+
+            # Save periodically
+            if i % SAVE_EVERY == 0:
+                with open(output_file, "w", encoding="utf-8") as f, stage("json_dump"):
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+
+        with open(output_file, "w", encoding="utf-8") as f, stage("json_dump"):
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+        print(f"Completed. Saved {len(results)} items to {output_file} "
+              f"({counts['error']} failed, {counts['rejected']} rejected by semantic gate)")
+        return results
@@ -0,0 +1,201 @@
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+from analyze_dataset_complexity import create_tagger, get_analysis
+from profiling import profiled
+
+VARIATION_KEYS = ["casual", "standard", "sonkeigo", "kenjougo"]
+
+# Thresholds are calibrated on data/jcommonsense/rewritten_dataset.json: they reject 13.6% of its items (136/1000),
+# mostly rewrites that swap the question's predicate (何と言う -> 何と伺う) or turn it into a generic template.
+# share of the original's lemma set that a variation must keep
+MIN_LEMMA_OVERLAP = 0.5
+# share of the original's content nouns that a variation must keep, directly or as an honorific equivalent
+MIN_NOUN_RECALL = 0.5
+# share of the original's verbs that must survive, directly or as a keigo equivalent
+MIN_PREDICATE_RECALL = 0.5
+
+MAX_REGENERATIONS = 2
+
+SYMBOL_POS = {"補助記号", "記号", "空白"}
+
+# light verbs carry no meaning of their own and are freely added/dropped by keigo forms
+LIGHT_VERBS = {"為る", "成る", "有る", "居る", "下さる", "頂く", "致す", "為さる"}
+
+# formal nouns (こと/ところ/とき/もの/ため) are grammar, not content; rewrites swap them freely (時 -> 際)
+FORMAL_NOUNS = {"事", "所", "時", "物", "為"}
+
+# verbs that may be dropped when they introduce a quotation: 〜を何と言う？ is asked as 〜は何ですか？ just as well
+QUOTATIVE_VERBS = {"言う"}
+
+# noun lemma -> lemmas that may legitimately replace it in a politeness rewrite
+NOUN_EQUIVALENTS = {
+    "人": {"方", "方々", "者", "人物"},
+    "人々": {"人", "方", "方々", "皆様", "皆さん"},
+    "子供": {"子", "御子様"},
+    "家": {"自宅", "宅", "家庭"},
+    "自分": {"自身"},
+}
+
+# verb lemma -> lemmas that may legitimately replace it in a politeness rewrite
+KEIGO_EQUIVALENTS = {
+    "言う": {"仰る", "仰す", "申す", "申し上げる", "呼ぶ", "称する", "呼称"},
+    "呼ぶ": {"言う", "仰る", "仰す", "申す", "称する", "呼称"},
+    "見る": {"御覧", "拝見", "見える"},
+    "見掛ける": {"御覧", "見る", "拝見", "見える"},
+    "使う": {"用いる", "使用", "利用"},
+    "売る": {"販売"},
+    "買う": {"購入", "求める"},
+    "作る": {"作成", "製作", "制作", "製造"},
+    "着る": {"召す", "召し", "着用"},
+    "住む": {"住まう", "住まい", "生息"},
+    "聞く": {"伺う", "承る", "拝聴"},
+    "訪ねる": {"伺う", "参る"},
+    "行く": {"いらっしゃる", "参る", "伺う", "越す"},
+    "来る": {"いらっしゃる", "参る", "見える", "越す"},
+    "食べる": {"召し上がる", "頂く"},
+    "飲む": {"召し上がる", "頂く"},
+    "知る": {"存じる", "存ずる", "御存じ"},
+    "思う": {"存じる", "存ずる", "考える"},
+    "考える": {"思う", "存じる"},
+    "与える": {"差し上げる", "上げる"},
+    "上げる": {"差し上げる"},
+    "貰う": {"頂く", "賜る"},
+    "呉れる": {"下さる"},
+    "会う": {"御目に掛かる"},
+    "答える": {"回答"},
+}
+
+# MeCab taggers are not thread-safe and the rewrite pipeline gates items from a thread pool,
+# so every thread parses with its own tagger
+_local = threading.local()
+
+def _get_tagger():
+    if not hasattr(_local, "tagger"):
+        _local.tagger = create_tagger()
+    return _local.tagger
+
+@lru_cache(maxsize=4096)
+def _lemmas(text: str) -> Tuple[frozenset, frozenset, frozenset, frozenset]:
+    """Returns (all lemmas, noun lemmas, verb lemmas, quoting verb lemmas) of a text, symbols removed.
+
+    Quoting verbs are the verbs right after the quotative particle と (何と言う, 何とお呼びになる).
+    """
+    tokens, pos_list = get_analysis(_get_tagger(), text)
+    lemmas, nouns, verbs, quoting = set(), set(), set(), set()
+    after_to = False
+    for lemma, pos in zip(tokens, pos_list):
+        if pos in SYMBOL_POS:
+            continue
+        lemmas.add(lemma)
+        if pos == "名詞":
+            nouns.add(lemma)
+        elif pos == "動詞":
+            verbs.add(lemma)
+            if after_to:
+                quoting.add(lemma)
+        if pos == "接頭辞" and after_to:
+            continue  # 何と|御|呼びになる
+        after_to = pos == "助詞" and lemma == "と"
+    return frozenset(lemmas), frozenset(nouns), frozenset(verbs), frozenset(quoting)
+
+def _recall(expected: frozenset, found: frozenset) -> float:
+    if not expected:
+        return 1.0
+    return len(expected & found) / len(expected)
+
+def _normalize(text: str) -> str:
+    return "".join(ch for ch in text if ch.isalnum())
+
+@profiled("semantic_gate")
+def validate_variations(original: str, variations: Dict[str, str]) -> Dict[str, List[str]]:
+    """Checks the 4 rewrites against the original question.
+
+    Returns a dict mapping each failing style to the reasons it failed; an empty dict means the item passes.
+    """
+    failures: Dict[str, List[str]] = {}
+    orig_lemmas, orig_nouns, orig_verbs, orig_quoting = _lemmas(original)
+    orig_nouns = orig_nouns - FORMAL_NOUNS
+    orig_verbs = orig_verbs - LIGHT_VERBS
+    droppable = orig_quoting & QUOTATIVE_VERBS
+    seen: Dict[str, str] = {}
+
+    for style in VARIATION_KEYS:
+        text = variations.get(style) if isinstance(variations, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            failures[style] = ["missing"]
+            continue
+
+        reasons = []
+        v_lemmas, _, _, v_quoting = _lemmas(text)
+
+        overlap = _recall(orig_lemmas, v_lemmas)
+        if overlap < MIN_LEMMA_OVERLAP:
+            reasons.append(f"lemma overlap {overlap:.2f}")
+
+        kept_nouns = {noun for noun in orig_nouns if noun in v_lemmas or NOUN_EQUIVALENTS.get(noun, set()) & v_lemmas}
+        if orig_nouns and len(kept_nouns) / len(orig_nouns) < MIN_NOUN_RECALL:
+            missing = sorted(orig_nouns - kept_nouns)
+            reasons.append(f"nouns dropped: {'、'.join(missing)}")
+
+        kept_verbs = {verb for verb in orig_verbs if verb in v_lemmas or KEIGO_EQUIVALENTS.get(verb, set()) & v_lemmas}
+        # the quotation carries the question: dropping it (何と言う -> 何ですか) keeps the meaning, but quoting with
+        # another verb (何と伺う) asks something else, however many of the other verbs survive
+        swapped = droppable - kept_verbs if v_quoting else set()
+        if not v_quoting:
+            kept_verbs |= droppable
+        if swapped or orig_verbs and len(kept_verbs) / len(orig_verbs) < MIN_PREDICATE_RECALL:
+            missing = sorted(orig_verbs - kept_verbs)
+            reasons.append(f"predicate changed: {'、'.join(missing)}")
+
+        key = _normalize(text)
+        if key in seen:
+            reasons.append(f"identical to {seen[key]}")
+        else:
+            seen[key] = style
+
+        if reasons:
+            failures[style] = reasons
+
+    return failures
+
+def format_failures(failures: Dict[str, List[str]]) -> str:
+    return "; ".join(f"{style} ({', '.join(reasons)})" for style, reasons in failures.items())
+
+def gate_variations(
+    original: str,
+    variations: Dict[str, str],
+    regenerate: Callable[[str], Dict[str, str]],
+    prompt: str,
+    max_regenerations: int = MAX_REGENERATIONS,
+) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """Validates the rewrites and re-requests only the failing styles until they pass or the budget runs out.
+
+    `regenerate` takes a prompt and returns a fresh variations dict. Returns the merged variations and any failures left.
+    """
+    variations = dict(variations) if isinstance(variations, dict) else {}
+    failures = validate_variations(original, variations)
+
+    for _ in range(max_regenerations):
+        if not failures:
+            break
+        retry_prompt = (
+            f"{prompt}\n\n"
+            f"The previous rewrite was rejected: {format_failures(failures)}.\n"
+            f"Rewrite again. Keep every noun and the meaning of the question's predicate unchanged, "
+            f"and make each variation distinct."
+        )
+        try:
+            fresh = regenerate(retry_prompt)
+        except Exception as e:
+            print(f"Regeneration failed: {e}")
+            continue
+        if not isinstance(fresh, dict):
+            continue
+        for style in failures:
+            if fresh.get(style):
+                variations[style] = fresh[style]
+        failures = validate_variations(original, variations)
+
+    return variations, failures
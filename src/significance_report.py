@@ -0,0 +1,204 @@
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+STYLES = ["original_question", "casual", "standard", "sonkeigo", "kenjougo"]
+
+NUM_RESAMPLES = 10_000
+CONFIDENCE = 0.95
+# below this many discordant pairs McNemar uses the exact binomial test instead of chi-square
+EXACT_MCNEMAR_LIMIT = 25
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "jcommonsense")
+
+def discover_runs(data_dir: str) -> List[str]:
+    """Run names are the suffixes of `<style>.<run>.json`, e.g. `accuracy`, `accuracy_2_0`."""
+    runs = set()
+    for path in glob.glob(os.path.join(data_dir, "*.accuracy*.json")):
+        style, _, rest = os.path.basename(path).partition(".")
+        if style in STYLES:
+            runs.add(rest[:-len(".json")])
+    return sorted(runs)
+
+def load_run(data_dir: str, run: str) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+    """Loads every style file of a run into arrays aligned by q_id.
+
+    Returns (q_ids, styles, correct, present), where correct/present are (n_items, n_styles) bool arrays.
+    """
+    per_style: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for style in STYLES:
+        path = os.path.join(data_dir, f"{style}.{run}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f).get("results", [])
+        q_ids = np.fromiter((r["q_id"] for r in results), dtype=np.int64, count=len(results))
+        correct = np.fromiter((bool(r["is_correct"]) for r in results), dtype=bool, count=len(results))
+        per_style[style] = (q_ids, correct)
+
+    styles = list(per_style)
+    all_q_ids = np.unique(np.concatenate([q for q, _ in per_style.values()])) if per_style else np.empty(0, dtype=np.int64)
+    correct = np.zeros((len(all_q_ids), len(styles)), dtype=bool)
+    present = np.zeros_like(correct)
+    for col, style in enumerate(styles):
+        q_ids, style_correct = per_style[style]
+        rows = np.searchsorted(all_q_ids, q_ids)
+        present[rows, col] = True
+        correct[rows, col] = style_correct
+    return all_q_ids, styles, correct, present
+
+def mcnemar_p(b: int, c: int) -> float:
+    """Two-sided McNemar p-value from the discordant counts b and c."""
+    n = b + c
+    if n == 0:
+        return 1.0
+    if n < EXACT_MCNEMAR_LIMIT:
+        tail = sum(math.comb(n, k) for k in range(min(b, c) + 1)) / 2 ** n
+        return min(1.0, 2 * tail)
+    stat = (abs(b - c) - 1) ** 2 / n
+    # chi-square survival with 1 degree of freedom
+    return math.erfc(math.sqrt(stat / 2))
+
+def bootstrap_accuracy_ci(correct: np.ndarray, present: np.ndarray, rng: np.random.Generator,
+                          num_resamples: int = NUM_RESAMPLES, confidence: float = CONFIDENCE) -> np.ndarray:
+    """Percentile bootstrap CIs of every style's accuracy, shape (n_styles, 2).
+
+    Resampling n Bernoulli outcomes with replacement only changes the number correct, so each resample is drawn
+    directly as Binomial(n, acc) instead of materializing an (num_resamples, n) index matrix.
+    """
+    n = present.sum(axis=0)
+    k = (correct & present).sum(axis=0)
+    acc = np.divide(k, n, out=np.zeros(len(n)), where=n > 0)
+    draws = rng.binomial(n[None, :], acc[None, :], size=(num_resamples, len(n))) / np.maximum(n, 1)
+    alpha = (1 - confidence) / 2
+    return np.quantile(draws, [alpha, 1 - alpha], axis=0).T
+
+def bootstrap_difference_ci(n10: int, n01: int, n: int, rng: np.random.Generator,
+                            num_resamples: int = NUM_RESAMPLES, confidence: float = CONFIDENCE) -> Tuple[float, float]:
+    """Paired percentile bootstrap CI of acc(a) - acc(b).
+
+    Per item the difference is +1 (only a right), -1 (only b right) or 0, so a resample of n items is a single
+    multinomial draw over those three outcomes.
+    """
+    if n == 0:
+        return (0.0, 0.0)
+    counts = rng.multinomial(n, [n10 / n, n01 / n, 1 - (n10 + n01) / n], size=num_resamples)
+    diffs = (counts[:, 0] - counts[:, 1]) / n
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(diffs, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+def build_report(q_ids: np.ndarray, styles: List[str], correct: np.ndarray, present: np.ndarray,
+                 num_resamples: int = NUM_RESAMPLES, seed: int = 0) -> Dict:
+    rng = np.random.default_rng(seed)
+
+    right = (correct & present).astype(np.int64)
+    wrong = (~correct & present).astype(np.int64)
+    # [s, t] = items right under s and wrong under t, for every style pair at once
+    n10 = right.T @ wrong
+    n11 = right.T @ right
+    n00 = wrong.T @ wrong
+
+    n = present.sum(axis=0)
+    accuracy_ci = bootstrap_accuracy_ci(correct, present, rng, num_resamples)
+    style_summary = {
+        style: {
+            "n": int(n[i]),
+            "accuracy": float(right[:, i].sum() / n[i]) if n[i] else 0.0,
+            "ci": [float(x) for x in accuracy_ci[i]],
+        }
+        for i, style in enumerate(styles)
+    }
+
+    pairs = []
+    for i in range(len(styles)):
+        for j in range(i + 1, len(styles)):
+            b, c = int(n10[i, j]), int(n10[j, i])
+            both = int(n11[i, j] + n00[i, j]) + b + c
+            low, high = bootstrap_difference_ci(b, c, both, rng, num_resamples)
+            pairs.append({
+                "a": styles[i],
+                "b": styles[j],
+                "n": both,
+                "accuracy_diff": (b - c) / both if both else 0.0,
+                "ci": [low, high],
+                "mcnemar_p": mcnemar_p(b, c),
+                # rows: a right/wrong, cols: b right/wrong
+                "table": [[int(n11[i, j]), b], [c, int(n00[i, j])]],
+            })
+
+    # an item flips when its styles disagree; flip_matrix[s][t] = 1 when it is right under s and wrong under t
+    flip_rows = np.flatnonzero((right.any(axis=1)) & (wrong.any(axis=1)))
+    flips = []
+    for row in flip_rows:
+        ok = right[row].astype(bool)
+        bad = wrong[row].astype(bool)
+        flips.append({
+            "q_id": int(q_ids[row]),
+            "correct": [s for s, x in zip(styles, ok) if x],
+            "incorrect": [s for s, x in zip(styles, bad) if x],
+            "flip_matrix": (ok[:, None] & bad[None, :]).astype(int).tolist(),
+        })
+
+    return {
+        "styles": styles,
+        "num_items": int(len(q_ids)),
+        "num_resamples": num_resamples,
+        "summary": style_summary,
+        "pairs": pairs,
+        "flip_counts": n10.tolist(),
+        "flips": flips,
+    }
+
+def print_report(run: str, report: Dict):
+    print(f"\n=== {run} ({report['num_items']} items, {report['num_resamples']} resamples) ===")
+    print(f"{'Style':<20} | {'N':<6} | {'Accuracy':<8} | {'95% CI'}")
+    print("-" * 60)
+    for style, s in report["summary"].items():
+        print(f"{style:<20} | {s['n']:<6} | {s['accuracy']:<8.4f} | [{s['ci'][0]:.4f}, {s['ci'][1]:.4f}]")
+
+    print()
+    print(f"{'Pair':<40} | {'Diff':<8} | {'95% CI':<18} | {'a only':<6} | {'b only':<6} | {'McNemar p'}")
+    print("-" * 105)
+    for p in report["pairs"]:
+        pair = f"{p['a']} vs {p['b']}"
+        ci = f"[{p['ci'][0]:+.4f}, {p['ci'][1]:+.4f}]"
+        print(f"{pair:<40} | {p['accuracy_diff']:<+8.4f} | {ci:<18} | {p['table'][0][1]:<6} | {p['table'][1][0]:<6} | {p['mcnemar_p']:.4g}")
+    print(f"\nItems whose correctness flips across styles: {len(report['flips'])}")
+
+def run_report(data_dir: str = DEFAULT_DATA_DIR, runs: List[str] = None, num_resamples: int = NUM_RESAMPLES, seed: int = 0):
+    runs = runs or discover_runs(data_dir)
+    if not runs:
+        print(f"No *.accuracy*.json files found in {data_dir}")
+        return
+
+    for run in runs:
+        start = time.perf_counter()
+        q_ids, styles, correct, present = load_run(data_dir, run)
+        if len(styles) < 2:
+            print(f"Skipping {run}: need at least 2 styles, found {styles}")
+            continue
+        report = build_report(q_ids, styles, correct, present, num_resamples, seed)
+        elapsed = time.perf_counter() - start
+
+        print_report(run, report)
+        output_file = os.path.join(data_dir, f"significance.{run}.json")
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved to {output_file} ({elapsed:.3f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paired significance tests between politeness styles.")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--runs", nargs="*", help="run suffixes such as accuracy accuracy_2_0 (default: all found)")
+    parser.add_argument("--resamples", type=int, default=NUM_RESAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_report(args.data_dir, args.runs, args.resamples, args.seed)